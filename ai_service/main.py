@@ -1,12 +1,16 @@
 import os
+import hmac
 import difflib
+from collections import deque
 import requests
-from fastapi import FastAPI
+from fastapi import FastAPI, Depends, HTTPException, Request
 from pydantic import BaseModel
 from typing import Dict, List, Any
 from dotenv import load_dotenv
 
 from utils import profile_to_prompt, clean_generated_text
+from ratelimit import AdmissionLimiter, build_store, client_key
+from tracing import TracingMiddleware, span
 
 # Load .env variables
 load_dotenv()
@@ -17,6 +21,27 @@ NUM_QUESTIONS = int(os.getenv("NUM_QUESTIONS", "5"))
 NUM_CANDIDATES = int(os.getenv("NUM_CANDIDATES", "10"))
 MAX_LENGTH = int(os.getenv("MAX_LENGTH", "128"))
 
+# Admission control (protects the HF quota)
+RATE_LIMIT_PER_SECOND = float(os.getenv("RATE_LIMIT_PER_SECOND", "0.5"))
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "5"))
+MAX_IN_FLIGHT = int(os.getenv("MAX_IN_FLIGHT", "4"))
+MAX_QUEUE = int(os.getenv("MAX_QUEUE", "16"))
+QUEUE_TIMEOUT = float(os.getenv("QUEUE_TIMEOUT", "10"))
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL")
+
+# Shared secret the backend sends in X-Internal-Token
+INTERNAL_TOKEN = os.getenv("INTERNAL_TOKEN")
+# Proxy addresses whose X-Forwarded-For uvicorn trusts (read by uvicorn too)
+FORWARDED_ALLOW_IPS = os.getenv("FORWARDED_ALLOW_IPS")
+# Requests carrying this in X-Debug-Token can read /limits and
+# /debug/traces and force tracing with "X-Trace: 1". Unset: disabled.
+DEBUG_TOKEN = os.getenv("DEBUG_TOKEN")
+
+# Opt-in request tracing (also enabled per request with "X-Trace: 1")
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", "1000"))
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "200"))
+
 if not HF_API_TOKEN:
     raise ValueError("❌ Missing HF_API_KEY in environment variables.")
 
@@ -29,6 +54,65 @@ HEADERS = {
 
 app = FastAPI(title="ClarityCheck AI Service (HuggingFace API)")
 
+def _token_matches(request: Request, header: str, expected: str | None) -> bool:
+    token = request.headers.get(header)
+    return bool(expected and token) and hmac.compare_digest(token, expected)
+
+
+def is_internal(request: Request) -> bool:
+    return _token_matches(request, "x-internal-token", INTERNAL_TOKEN)
+
+
+def is_debug(request: Request) -> bool:
+    return _token_matches(request, "x-debug-token", DEBUG_TOKEN)
+
+
+def require_debug_token(request: Request):
+    # 404 rather than 401/403 so the endpoints don't advertise themselves
+    if not is_debug(request):
+        raise HTTPException(status_code=404, detail="Not Found")
+
+
+def limiter_key(request: Request) -> str | None:
+    # None skips the per-client bucket (in-flight cap still applies).
+    # Without INTERNAL_TOKEN every backend call looks like one client.
+    if not INTERNAL_TOKEN:
+        return None
+    # Backend calls carry the end client in X-Client-Id; only trust it
+    # when the shared token proves the call came from the backend
+    if is_internal(request):
+        client_id = request.headers.get("x-client-id")
+        return "fwd:" + client_id if client_id else None
+    return client_key(request) if FORWARDED_ALLOW_IPS else None
+
+
+if not INTERNAL_TOKEN:
+    print("⚠️ INTERNAL_TOKEN not set: per-client rate limiting is off, only the in-flight cap applies")
+elif not FORWARDED_ALLOW_IPS:
+    print("⚠️ FORWARDED_ALLOW_IPS not set: only backend calls are rate limited per client")
+
+
+limiter = AdmissionLimiter(
+    rate=RATE_LIMIT_PER_SECOND,
+    burst=RATE_LIMIT_BURST,
+    max_in_flight=MAX_IN_FLIGHT,
+    max_queue=MAX_QUEUE,
+    queue_timeout=QUEUE_TIMEOUT,
+    store=build_store(RATE_LIMIT_REDIS_URL),
+    key_func=limiter_key,
+)
+
+slow_traces = deque(maxlen=TRACE_BUFFER_SIZE)
+
+app.add_middleware(
+    TracingMiddleware,
+    buffer=slow_traces,
+    sample_rate=TRACE_SAMPLE_RATE,
+    slow_ms=TRACE_SLOW_MS,
+    # The backend forwards its sampling decision; others need DEBUG_TOKEN
+    trust_header=lambda request: is_internal(request) or is_debug(request),
+)
+
 
 # ----------- SCHEMAS ------------
 class FollowupRequest(BaseModel):
@@ -52,6 +136,16 @@ def root():
     return {"status": "ok", "service": "claritycheck-ai-hf"}
 
 
+@app.get("/limits", dependencies=[Depends(require_debug_token)])
+def limits():
+    return limiter.stats()
+
+
+@app.get("/debug/traces", dependencies=[Depends(require_debug_token)])
+def debug_traces():
+    return {"traces": list(reversed(slow_traces))}
+
+
 # ----------- FILTERS & HELPERS ------------
 
 FORBIDDEN_PATTERNS = [
@@ -125,7 +219,7 @@ FALLBACK = {
 
 
 # ----------- POST: generate followups ------------
-@app.post("/followups", response_model=FollowupsResponse)
+@app.post("/followups", response_model=FollowupsResponse, dependencies=[Depends(limiter)])
 def generate_followups(req: FollowupRequest):
 
     product = req.product or {}
@@ -138,7 +232,6 @@ def generate_followups(req: FollowupRequest):
 
     # Normalize nested profile shape
     profile_data = profile.get("profile", profile)
-    structured_profile = profile_to_prompt(profile_data)
 
     # ---------- Detect Category ----------
     if any(x in category_raw for x in ["skincare", "cosmetic", "serum", "cream"]):
@@ -153,7 +246,9 @@ def generate_followups(req: FollowupRequest):
         product_type = "generic"
 
     # ---------- Build Prompt ----------
-    prompt = f"""
+    with span("prompt_build"):
+        structured_profile = profile_to_prompt(profile_data)
+        prompt = f"""
 Generate a concise, category-specific transparency follow-up question.
 Rules:
 - Focus ONLY on transparency, safety, sourcing, tests, traceability.
@@ -173,20 +268,21 @@ Return ONLY the question text.
 """
 
     # ---------- Request HuggingFace API ----------
-    response = requests.post(
-        HF_URL,
-        headers=HEADERS,
-        json={
-            "inputs": prompt,
-            "parameters": {
-                "max_new_tokens": MAX_LENGTH,
-                "num_return_sequences": NUM_CANDIDATES,
-                "return_full_text": False
+    with span("inference"):
+        response = requests.post(
+            HF_URL,
+            headers=HEADERS,
+            json={
+                "inputs": prompt,
+                "parameters": {
+                    "max_new_tokens": MAX_LENGTH,
+                    "num_return_sequences": NUM_CANDIDATES,
+                    "return_full_text": False
+                }
             }
-        }
-    )
+        )
 
-    raw_outputs = response.json()
+        raw_outputs = response.json()
 
     # HF might return a list or error message
     if isinstance(raw_outputs, dict) and "error" in raw_outputs:
@@ -194,9 +290,10 @@ Return ONLY the question text.
         raw_outputs = []
 
     candidates = []
-    for item in raw_outputs:
-        text = item.get("generated_text", "").strip()
-        candidates.append(clean_generated_text(text))
+    with span("clean"):
+        for item in raw_outputs:
+            text = item.get("generated_text", "").strip()
+            candidates.append(clean_generated_text(text))
 
     # ---------- Filtering / Deduping ----------
     final = []
@@ -205,11 +302,13 @@ Return ONLY the question text.
     for q in candidates:
         if not q:
             continue
-        if is_forbidden(q):
-            continue
-        if not is_meaningful(q):
+        with span("filter"):
+            keep = not is_forbidden(q) and is_meaningful(q)
+        if not keep:
             continue
-        if is_duplicate(q, seen):
+        with span("dedupe"):
+            duplicate = is_duplicate(q, seen)
+        if duplicate:
             continue
 
         seen.append(q)
@@ -219,18 +318,19 @@ Return ONLY the question text.
             break
 
     # ---------- Add fallbacks if needed ----------
-    fallback_pool = FALLBACK.get(product_type, FALLBACK["generic"])
-    for fb in fallback_pool:
-        if len(final) >= NUM_QUESTIONS:
-            break
-        if not is_duplicate(fb, seen):
-            seen.append(fb)
-            final.append(fb)
+    with span("fallback"):
+        fallback_pool = FALLBACK.get(product_type, FALLBACK["generic"])
+        for fb in fallback_pool:
+            if len(final) >= NUM_QUESTIONS:
+                break
+            if not is_duplicate(fb, seen):
+                seen.append(fb)
+                final.append(fb)
 
     # ---------- Build Response ----------
-    return {
-        "questions": [
-            {"id": f"q{i+1}", "text": q, "type": "text", "options": None}
+    return FollowupsResponse(
+        questions=[
+            QuestionOut(id=f"q{i+1}", text=q, type="text", options=None)
             for i, q in enumerate(final[:NUM_QUESTIONS])
         ]
-    }
+    )
@@ -0,0 +1,54 @@
+import os
+
+# main.py refuses to start without a token; HF is always mocked in tests
+os.environ.setdefault("HF_API_KEY", "test-token")
+# Keep every sampled trace so tests can inspect the ring buffer
+os.environ.setdefault("TRACE_SLOW_MS", "0")
+
+import types
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from ratelimit import MemoryBucketStore
+
+
+class FakeHFResponse:
+    def json(self):
+        return [{"generated_text": "Are the ingredients lab tested for purity"}]
+
+
+@pytest.fixture
+def hf_calls(monkeypatch):
+    calls = []
+
+    def fake_post(url, headers=None, json=None):
+        calls.append(json)
+        return FakeHFResponse()
+
+    monkeypatch.setattr(main, "requests", types.SimpleNamespace(post=fake_post))
+    return calls
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    """The app's limiter with a fresh bucket store and small limits."""
+    monkeypatch.setattr(main.limiter, "store", MemoryBucketStore())
+    monkeypatch.setattr(main.limiter, "rate", 0.1)
+    monkeypatch.setattr(main.limiter, "burst", 1)
+    monkeypatch.setattr(main, "INTERNAL_TOKEN", "s3cret")
+    monkeypatch.setattr(main, "FORWARDED_ALLOW_IPS", "*")
+    return main.limiter
+
+
+@pytest.fixture
+def client(hf_calls):
+    return TestClient(main.app)
+
+
+@pytest.fixture
+def traces(monkeypatch):
+    main.slow_traces.clear()
+    monkeypatch.setattr(main, "INTERNAL_TOKEN", "s3cret")
+    return main.slow_traces
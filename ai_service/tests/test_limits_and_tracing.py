@@ -0,0 +1,82 @@
+import main
+
+
+
+# -------------------------
+# Rate limiting on /followups
+# -------------------------
+def test_followups_rate_limited_per_client(client, limiter):
+    assert client.post("/followups", json={}).status_code == 200
+
+    r = client.post("/followups", json={})
+    assert r.status_code == 429
+    assert int(r.headers["retry-after"]) >= 1
+
+
+def test_no_per_client_bucket_without_internal_token(client, limiter, monkeypatch):
+    monkeypatch.setattr(main, "INTERNAL_TOKEN", None)
+
+    for _ in range(3):
+        assert client.post("/followups", json={}, headers={"X-Client-Id": "ip:1.1.1.1"}).status_code == 200
+
+
+def test_client_id_ignored_without_internal_token(client, limiter):
+    assert client.post("/followups", json={}).status_code == 200
+
+    for i in range(3):
+        r = client.post("/followups", json={}, headers={"X-Client-Id": f"ip:10.0.0.{i}"})
+        assert r.status_code == 429
+
+    r = client.post("/followups", json={}, headers={"X-Client-Id": "ip:10.0.0.9", "X-Internal-Token": "wrong"})
+    assert r.status_code == 429
+
+
+def test_client_id_trusted_from_backend(client, limiter):
+    backend = {"X-Internal-Token": "s3cret"}
+
+    assert client.post("/followups", json={}, headers={**backend, "X-Client-Id": "ip:1.1.1.1"}).status_code == 200
+    assert client.post("/followups", json={}, headers={**backend, "X-Client-Id": "ip:1.1.1.1"}).status_code == 429
+    # A different end client behind the same backend has its own bucket
+    assert client.post("/followups", json={}, headers={**backend, "X-Client-Id": "ip:2.2.2.2"}).status_code == 200
+
+
+# -------------------------
+# Tracing
+# -------------------------
+def test_trace_header_ignored_from_untrusted_callers(client, traces):
+    r = client.post("/followups", json={}, headers={"X-Trace": "1"})
+
+    assert r.status_code == 200
+    assert r.headers["x-correlation-id"]
+    assert len(traces) == 0
+
+
+def test_debug_endpoints_need_debug_token(client, traces, monkeypatch):
+    monkeypatch.setattr(main, "DEBUG_TOKEN", "dbg")
+
+    assert client.get("/limits").status_code == 404
+    assert client.get("/debug/traces", headers={"X-Debug-Token": "wrong"}).status_code == 404
+    assert client.get("/limits", headers={"X-Debug-Token": "dbg"}).json()["max_in_flight"] >= 1
+
+    client.post("/followups", json={}, headers={"X-Trace": "1", "X-Debug-Token": "dbg"})
+    r = client.get("/debug/traces", headers={"X-Debug-Token": "dbg"})
+    assert [t["path"] for t in r.json()["traces"]] == ["/followups"]
+
+
+def test_debug_endpoints_off_when_token_unset(client, monkeypatch):
+    monkeypatch.setattr(main, "DEBUG_TOKEN", None)
+
+    assert client.get("/limits", headers={"X-Debug-Token": ""}).status_code == 404
+
+
+def test_backend_trace_records_stages_under_its_correlation_id(client, traces):
+    headers = {"X-Trace": "1", "X-Internal-Token": "s3cret", "X-Correlation-Id": "abc123"}
+    r = client.post("/followups", json={"product": {"category": "food"}}, headers=headers)
+
+    assert r.headers["x-correlation-id"] == "abc123"
+    assert len(traces) == 1
+    trace = traces[0]
+    assert trace["correlation_id"] == "abc123"
+    assert trace["path"] == "/followups"
+    for stage in ["prompt_build", "inference", "clean", "filter", "dedupe", "fallback"]:
+        assert stage in trace["spans"]
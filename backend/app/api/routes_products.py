@@ -1,10 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 import requests
 
-from app.schemas.product import ProductCreate, ProductOut
-from app.schemas.profile import ProfileIn
-from app.utils.deps import get_db
+from app.schemas.product import ProductCreate, ProductOut, ProductDetailOut
+from app.schemas.profile import ProfileIn, ProfileOut, ProfileSavedOut
+from app.schemas.followup import (
+    FollowupQuestionOut,
+    FollowupsOut,
+    AnswersIn,
+    AnswersOut,
+    AnswersSavedOut
+)
+from app.core.config import settings
+from app.utils.deps import get_db, ai_limiter
+from app.core.ratelimit import client_key
+from app.core.tracing import span, outbound_headers
 from app.crud.products import (
     create_product,
     save_profile,
@@ -12,7 +22,12 @@ from app.crud.products import (
     get_all_products,
     get_product_by_id
 )
-from app.crud.followups import log_followup
+from app.crud.followups import (
+    log_followup,
+    get_followups_for_product,
+    save_answer_record,
+    get_answer_record
+)
 
 router = APIRouter()
 
@@ -39,7 +54,7 @@ def create_new(payload: ProductCreate, db: Session = Depends(get_db)):
 # ---------------------------------------------------------
 # 1.5) Get product + latest profile
 # ---------------------------------------------------------
-@router.get("/{product_id}")
+@router.get("/{product_id}", response_model=ProductDetailOut)
 def get_product(product_id: str, db: Session = Depends(get_db)):
     product = get_product_by_id(db, product_id)
     if not product:
@@ -47,17 +62,27 @@ def get_product(product_id: str, db: Session = Depends(get_db)):
 
     profile = get_latest_profile(db, product_id)
 
-    return {
-        **product.__dict__,
-        "profile": profile.__dict__ if profile else {}
-    }
+    detail = ProductDetailOut.model_validate(product)
+    if profile:
+        detail.profile = ProfileOut.model_validate(profile)
+
+    return detail
 
 
 # ---------------------------------------------------------
 # 2) Update profile + call AI service for followups
 # ---------------------------------------------------------
-@router.post("/{product_id}/profile")
-def update_profile(product_id: str, payload: ProfileIn, db: Session = Depends(get_db)):
+@router.post(
+    "/{product_id}/profile",
+    response_model=ProfileSavedOut,
+    dependencies=[Depends(ai_limiter)]
+)
+def update_profile(
+    product_id: str,
+    payload: ProfileIn,
+    request: Request,
+    db: Session = Depends(get_db)
+):
 
     saved_profile = save_profile(db, product_id, payload.profile)
 
@@ -76,78 +101,78 @@ def update_profile(product_id: str, payload: ProfileIn, db: Session = Depends(ge
             "profile": payload.profile
         }
 
-        response = requests.post(AI_SERVICE_URL, json=payload_for_ai, timeout=15)
+        # Let the AI service rate-limit the end client, not the backend itself
+        headers = {"X-Client-Id": client_key(request), **outbound_headers()}
+        if settings.INTERNAL_TOKEN:
+            headers["X-Internal-Token"] = settings.INTERNAL_TOKEN
+
+        with span("http ai_service"):
+            response = requests.post(
+                AI_SERVICE_URL, json=payload_for_ai, headers=headers, timeout=15
+            )
         response.raise_for_status()
 
-        followups = response.json().get("questions", [])
+        followups = [
+            FollowupQuestionOut.model_validate(q)
+            for q in response.json().get("questions", [])
+        ]
 
         for q in followups:
             log_followup(
                 db,
                 product_id=product_id,
-                question=q.get("text"),
+                question=q.text,
                 answer=None,
                 asked_by="ai"
             )
 
+    except requests.HTTPError as e:
+        # AI service over capacity: pass it on so the client backs off and retries
+        upstream = e.response
+        if upstream is not None and upstream.status_code in (429, 503):
+            retry_after = upstream.headers.get("Retry-After")
+            raise HTTPException(
+                status_code=upstream.status_code,
+                detail="AI service busy, try again shortly",
+                headers={"Retry-After": retry_after} if retry_after else None,
+            )
+        print(f"❌ AI Service Error: {e}")
+
     except Exception as e:
         print(f"❌ AI Service Error: {e}")
 
-    return {
-        "status": "ok",
-        "profile_id": saved_profile.id,
-        "followups": followups
-    }
+    return ProfileSavedOut(profile_id=saved_profile.id, followups=followups)
 
 
 # ---------------------------------------------------------
 # 3) Get saved followup questions
 # ---------------------------------------------------------
-@router.get("/{product_id}/followups")
+@router.get("/{product_id}/followups", response_model=FollowupsOut)
 def get_followups(product_id: str, db: Session = Depends(get_db)):
-    from app.crud.followups import get_followups_for_product
-
     followups = get_followups_for_product(db, product_id)
 
     result = [
-        {
-            "id": f"q{i+1}",
-            "text": f.question,
-            "type": "text",
-            "options": None
-        }
+        FollowupQuestionOut(id=f"q{i+1}", text=f.question)
         for i, f in enumerate(followups)
     ]
 
-    return {"followups": result}
+    return FollowupsOut(followups=result)
 
 
 # ---------------------------------------------------------
 # 4) Save answers
 # ---------------------------------------------------------
-from pydantic import BaseModel
-from app.crud.followups import save_answer_record, get_answer_record
-
-
-class AnswersIn(BaseModel):
-    answers: dict
-
-
-@router.post("/{product_id}/answers")
+@router.post("/{product_id}/answers", response_model=AnswersSavedOut)
 def save_answers(product_id: str, payload: AnswersIn, db: Session = Depends(get_db)):
     save_answer_record(db, product_id, payload.answers)
 
-    return {
-        "status": "ok",
-        "product_id": product_id,
-        "saved_answers": payload.answers
-    }
+    return AnswersSavedOut(product_id=product_id, saved_answers=payload.answers)
 
 
 # ---------------------------------------------------------
 # 5) Get saved answers
 # ---------------------------------------------------------
-@router.get("/{product_id}/answers")
+@router.get("/{product_id}/answers", response_model=AnswersOut)
 def get_answers(product_id: str, db: Session = Depends(get_db)):
     record = get_answer_record(db, product_id)
-    return {"answers": record or {}}
+    return AnswersOut(answers=record or {})
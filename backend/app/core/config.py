@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic_settings import BaseSettings
 
 
@@ -8,6 +9,32 @@ class Settings(BaseSettings):
 
     AI_SERVICE_URL: str = "http://localhost:8001/followups"  # <-- ADD THIS
 
+    # Admission control for the AI-backed routes
+    RATE_LIMIT_PER_SECOND: float = 0.5      # per API key / IP
+    RATE_LIMIT_BURST: int = 5
+    AI_MAX_IN_FLIGHT: int = 4               # per worker
+    AI_MAX_QUEUE: int = 16
+    AI_QUEUE_TIMEOUT: float = 10.0          # seconds
+    RATE_LIMIT_REDIS_URL: Optional[str] = None  # share buckets across workers
+
+    # Proxy addresses whose X-Forwarded-For uvicorn trusts (uvicorn reads
+    # the same env var). Unset: clients can't be told apart behind the
+    # proxy, so the per-client bucket is skipped (in-flight cap only).
+    FORWARDED_ALLOW_IPS: Optional[str] = None
+
+    # Shared secret sent to the AI service; it only trusts our
+    # X-Client-Id (per-client limits) when this matches its own
+    INTERNAL_TOKEN: Optional[str] = None
+
+    # Requests carrying this in X-Debug-Token can read /limits and
+    # /debug/traces and force tracing with "X-Trace: 1". Unset: disabled.
+    DEBUG_TOKEN: Optional[str] = None
+
+    # Opt-in request tracing (also enabled per request with "X-Trace: 1")
+    TRACE_SAMPLE_RATE: float = 0.0          # 0..1
+    TRACE_SLOW_MS: float = 1000.0           # keep sampled requests slower than this
+    TRACE_BUFFER_SIZE: int = 200
+
     class Config:
         env_file = ".env"
 
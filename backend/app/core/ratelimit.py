@@ -0,0 +1,248 @@
+import asyncio
+import math
+import threading
+import time
+from typing import Callable, Optional, Tuple
+
+from fastapi import HTTPException, Request
+
+from app.core.tracing import span
+
+try:
+    import redis.asyncio as aioredis
+    from redis.exceptions import RedisError
+except ImportError:  # optional, only needed for the shared store
+    aioredis = None
+    RedisError = None
+
+
+# -------------------------
+# Client identity
+# -------------------------
+def client_key(request: Request) -> str:
+    """
+    Client IP as seen by uvicorn. X-Forwarded-For is never read here:
+    uvicorn only applies it (--proxy-headers) for proxies listed in
+    FORWARDED_ALLOW_IPS, so callers can't pick their own bucket.
+    """
+    return "ip:" + (request.client.host if request.client else "unknown")
+
+
+# -------------------------
+# Token bucket stores
+# -------------------------
+class MemoryBucketStore:
+    """Per-process token buckets. Limits are per worker."""
+
+    MAX_KEYS = 10000
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    async def take(self, key: str, rate: float, burst: int) -> Tuple[bool, float]:
+        now = time.monotonic()
+        with self._lock:
+            tokens, ts = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - ts) * rate)
+
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                allowed, retry_after = True, 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                allowed, retry_after = False, (1 - tokens) / rate
+
+            if len(self._buckets) > self.MAX_KEYS:
+                self._prune(now, rate, burst)
+
+        return allowed, retry_after
+
+    def _prune(self, now: float, rate: float, burst: int):
+        # A bucket idle long enough to refill completely is the same as no bucket
+        idle = burst / rate
+        self._buckets = {
+            k: v for k, v in self._buckets.items() if now - v[1] < idle
+        }
+
+
+class RedisBucketStore:
+    """Token buckets in Redis so limits hold across workers / instances."""
+
+    # After a failure Redis is skipped for this long, so an outage
+    # doesn't add a socket timeout to every guarded request
+    COOLDOWN = 5.0
+
+    # KEYS[1] = bucket key, ARGV = rate, burst
+    # Uses the Redis clock so worker clock skew doesn't change refill rates
+    SCRIPT = """
+local b = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local tokens = tonumber(b[1]) or burst
+local ts = tonumber(b[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+    def __init__(self, url: str, prefix: str = "claritycheck:rl:"):
+        if aioredis is None:
+            raise RuntimeError("redis package is required for RATE_LIMIT_REDIS_URL")
+        self._redis = aioredis.from_url(
+            url, socket_timeout=0.5, socket_connect_timeout=0.5
+        )
+        self._script = self._redis.register_script(self.SCRIPT)
+        self._prefix = prefix
+        # Used while Redis is unreachable, so an outage degrades to
+        # per-worker limits instead of failing every request
+        self._fallback = MemoryBucketStore()
+        self._retry_at = 0.0
+        self.degraded = False
+        self.errors = 0
+
+    async def take(self, key: str, rate: float, burst: int) -> Tuple[bool, float]:
+        if self.degraded and time.monotonic() < self._retry_at:
+            return await self._fallback.take(key, rate, burst)
+
+        try:
+            allowed, tokens = await self._script(
+                keys=[self._prefix + key], args=[rate, burst]
+            )
+        except (RedisError, OSError) as e:
+            self.errors += 1
+            self._retry_at = time.monotonic() + self.COOLDOWN
+            if not self.degraded:
+                self.degraded = True
+                print(f"❌ Rate limit store unreachable, using in-memory buckets: {e}")
+            return await self._fallback.take(key, rate, burst)
+
+        if self.degraded:
+            self.degraded = False
+            print("✅ Rate limit store reachable again")
+
+        if int(allowed):
+            return True, 0.0
+        return False, (1 - float(tokens)) / rate
+
+
+# -------------------------
+# Admission control
+# -------------------------
+class AdmissionLimiter:
+    """
+    FastAPI dependency guarding the expensive AI-backed routes.
+
+    1. Per-client token bucket  -> 429 + Retry-After when empty
+    2. Global in-flight cap      -> waits in a bounded queue
+    3. Queue full / wait timeout -> 503 + Retry-After
+
+    The in-flight cap and queue are per process; the buckets are shared
+    when a RedisBucketStore is used. rate=0, or a key_func returning None
+    (caller can't be identified), skips the bucket and keeps the cap.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        max_in_flight: int,
+        max_queue: int,
+        queue_timeout: float,
+        store=None,
+        key_func: Callable[[Request], Optional[str]] = None,
+    ):
+        if rate < 0 or burst < 1 or max_in_flight < 1:
+            raise ValueError("rate must be >= 0, burst and max_in_flight >= 1")
+
+        self.rate = rate
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.store = store or MemoryBucketStore()
+        self.key_func = key_func or client_key
+
+        self._sem: Optional[asyncio.Semaphore] = None
+        self.in_flight = 0
+        self.queued = 0
+        self.rejected_rate = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+
+    async def __call__(self, request: Request):
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.max_in_flight)
+
+        key = self.key_func(request) if self.rate > 0 else None
+        if key is not None:
+            await self._take_token(key)
+
+        if self._sem.locked():
+            if self.queued >= self.max_queue:
+                self.rejected_queue_full += 1
+                raise self._overloaded()
+
+            self.queued += 1
+            try:
+                with span("queue_wait"):
+                    await asyncio.wait_for(self._sem.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.rejected_timeout += 1
+                raise self._overloaded()
+            finally:
+                self.queued -= 1
+        else:
+            await self._sem.acquire()
+
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._sem.release()
+
+    async def _take_token(self, key: str):
+        allowed, retry_after = await self.store.take(key, self.rate, self.burst)
+        if not allowed:
+            self.rejected_rate += 1
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests",
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+            )
+
+    def _overloaded(self) -> HTTPException:
+        return HTTPException(
+            status_code=503,
+            detail="Server busy, try again shortly",
+            headers={"Retry-After": str(max(1, math.ceil(self.queue_timeout)))},
+        )
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queue_depth": self.queued,
+            "max_queue": self.max_queue,
+            "rejected": {
+                "rate_limited": self.rejected_rate,
+                "queue_full": self.rejected_queue_full,
+                "queue_timeout": self.rejected_timeout,
+            },
+            "store": type(self.store).__name__,
+            "store_errors": getattr(self.store, "errors", 0),
+            "store_degraded": getattr(self.store, "degraded", False),
+        }
+
+
+def build_store(redis_url: Optional[str]):
+    return RedisBucketStore(redis_url) if redis_url else MemoryBucketStore()
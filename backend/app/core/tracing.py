@@ -0,0 +1,146 @@
+import random
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+from sqlalchemy import event
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+
+CORRELATION_HEADER = "X-Correlation-Id"
+TRACE_HEADER = "X-Trace"
+
+_correlation_id: ContextVar[Optional[str]] = ContextVar("correlation_id", default=None)
+_trace: ContextVar[Optional["Trace"]] = ContextVar("trace", default=None)
+
+
+class Trace:
+    """Span totals for one sampled request, aggregated by span name."""
+
+    def __init__(self):
+        self.started_at = datetime.now(timezone.utc)
+        self.spans = {}
+
+    def add(self, name: str, seconds: float):
+        total, count = self.spans.get(name, (0.0, 0))
+        self.spans[name] = (total + seconds, count + 1)
+
+    def to_dict(self) -> dict:
+        return {
+            name: {"ms": round(total * 1000, 2), "count": count}
+            for name, (total, count) in self.spans.items()
+        }
+
+
+# -------------------------
+# Span helpers
+# -------------------------
+@contextmanager
+def span(name: str):
+    """Time a block into the current trace. No-op when not sampled."""
+    trace = _trace.get()
+    if trace is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, time.perf_counter() - start)
+
+
+def outbound_headers() -> dict:
+    """Headers that carry the correlation id (and sampling) to ai_service."""
+    headers = {}
+    cid = _correlation_id.get()
+    if cid:
+        headers[CORRELATION_HEADER] = cid
+    if _trace.get() is not None:
+        headers[TRACE_HEADER] = "1"
+    return headers
+
+
+def instrument_engine(engine):
+    """Record every SQL statement as a "db" span on sampled requests."""
+
+    # The start time lives on the per-statement context, so a statement
+    # that raises can't leave a stale value on the pooled connection
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if context is not None and _trace.get() is not None:
+            context._trace_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        trace = _trace.get()
+        start = getattr(context, "_trace_start", None)
+        if trace is not None and start is not None:
+            trace.add("db", time.perf_counter() - start)
+
+
+# -------------------------
+# Middleware
+# -------------------------
+class TracingMiddleware(BaseHTTPMiddleware):
+    """
+    Opt-in request tracing.
+
+    Every request gets a correlation id (taken from X-Correlation-Id or
+    generated). A request is sampled when it wins the sample_rate draw,
+    or sends "X-Trace: 1" and trust_header(request) allows it; sampled
+    requests slower than slow_ms are pushed into `buffer` (a bounded
+    deque) for the debug endpoint.
+    """
+
+    def __init__(
+        self,
+        app,
+        buffer: deque,
+        sample_rate: float = 0.0,
+        slow_ms: float = 1000.0,
+        trust_header: Callable[[Request], bool] = lambda request: False,
+    ):
+        super().__init__(app)
+        self.buffer = buffer
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.trust_header = trust_header
+
+    async def dispatch(self, request, call_next):
+        cid = request.headers.get(CORRELATION_HEADER) or uuid.uuid4().hex
+        cid_token = _correlation_id.set(cid)
+
+        sampled = (
+            request.headers.get(TRACE_HEADER) == "1" and self.trust_header(request)
+        ) or random.random() < self.sample_rate
+        trace = Trace() if sampled else None
+        trace_token = _trace.set(trace)
+
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+        finally:
+            total_ms = (time.perf_counter() - start) * 1000
+            _trace.reset(trace_token)
+            _correlation_id.reset(cid_token)
+
+            if trace is not None and total_ms >= self.slow_ms:
+                self.buffer.append({
+                    "correlation_id": cid,
+                    "method": request.method,
+                    "path": request.url.path,
+                    "status": status,
+                    "started_at": trace.started_at.isoformat(),
+                    "total_ms": round(total_ms, 2),
+                    "spans": trace.to_dict(),
+                })
+
+        response.headers[CORRELATION_HEADER] = cid
+        return response
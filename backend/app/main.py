@@ -1,10 +1,15 @@
-from fastapi import FastAPI
+from collections import deque
+from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.routes_products import router as products_router
+from app.core.config import settings
 from app.core.db import Base, engine
+from app.core.tracing import TracingMiddleware, instrument_engine
+from app.utils.deps import ai_limiter, has_debug_token, require_debug_token
 
 # Create tables
 Base.metadata.create_all(bind=engine)
+instrument_engine(engine)
 
 app = FastAPI(title="ClarityCheck Backend")
 
@@ -19,6 +24,19 @@ app.add_middleware(
     allow_headers=["*"],        # allow ALL headers
 )
 
+# -------------------------
+# Request tracing (sampled)
+# -------------------------
+slow_traces = deque(maxlen=settings.TRACE_BUFFER_SIZE)
+
+app.add_middleware(
+    TracingMiddleware,
+    buffer=slow_traces,
+    sample_rate=settings.TRACE_SAMPLE_RATE,
+    slow_ms=settings.TRACE_SLOW_MS,
+    trust_header=has_debug_token,
+)
+
 # -------------------------
 # Routers
 # -------------------------
@@ -30,3 +48,17 @@ app.include_router(products_router, prefix="/products", tags=["products"])
 @app.get("/")
 def health():
     return {"status": "ok"}
+
+
+# -------------------------
+# Debug endpoints (X-Debug-Token required)
+# -------------------------
+@app.get("/limits", dependencies=[Depends(require_debug_token)])
+def limits():
+    return ai_limiter.stats()
+
+
+# Slow sampled requests (newest first)
+@app.get("/debug/traces", dependencies=[Depends(require_debug_token)])
+def debug_traces():
+    return {"traces": list(reversed(slow_traces))}
@@ -0,0 +1,22 @@
+from pydantic import BaseModel
+from typing import Any, Dict, List, Optional
+
+class FollowupQuestionOut(BaseModel):
+    id: str
+    text: str
+    type: str = "text"
+    options: Optional[List[str]] = None
+
+class FollowupsOut(BaseModel):
+    followups: List[FollowupQuestionOut]
+
+class AnswersIn(BaseModel):
+    answers: dict
+
+class AnswersOut(BaseModel):
+    answers: Dict[str, Any]
+
+class AnswersSavedOut(BaseModel):
+    status: str = "ok"
+    product_id: str
+    saved_answers: Dict[str, Any]
@@ -1,5 +1,8 @@
 from pydantic import BaseModel, ConfigDict
-from typing import Optional
+from datetime import datetime
+from typing import Any, Dict, Optional, Union
+
+from app.schemas.profile import ProfileOut
 
 class ProductCreate(BaseModel):
     name: str
@@ -13,3 +16,8 @@ class ProductOut(BaseModel):
     description: Optional[str]
 
     model_config = ConfigDict(from_attributes=True)
+
+class ProductDetailOut(ProductOut):
+    created_at: Optional[datetime] = None
+    # Empty dict when the product has no profile yet (frontend relies on it)
+    profile: Union[ProfileOut, Dict[str, Any]] = {}
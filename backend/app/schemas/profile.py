@@ -1,5 +1,22 @@
-from pydantic import BaseModel
-from typing import Any, Dict
+from pydantic import BaseModel, ConfigDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from app.schemas.followup import FollowupQuestionOut
 
 class ProfileIn(BaseModel):
     profile: Dict[str, Any]
+
+class ProfileOut(BaseModel):
+    id: str
+    product_id: str
+    profile: Dict[str, Any]
+    version: Optional[int] = None
+    created_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+class ProfileSavedOut(BaseModel):
+    status: str = "ok"
+    profile_id: str
+    followups: List[FollowupQuestionOut]
@@ -1,4 +1,10 @@
+import hmac
+
+from fastapi import HTTPException, Request
+
+from app.core.config import settings
 from app.core.db import SessionLocal
+from app.core.ratelimit import AdmissionLimiter, build_store, client_key
 
 def get_db():
     db = SessionLocal()
@@ -6,3 +12,34 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def has_debug_token(request: Request) -> bool:
+    token = request.headers.get("x-debug-token")
+    return bool(settings.DEBUG_TOKEN and token) and hmac.compare_digest(token, settings.DEBUG_TOKEN)
+
+
+def require_debug_token(request: Request):
+    # 404 rather than 401/403 so the endpoints don't advertise themselves
+    if not has_debug_token(request):
+        raise HTTPException(status_code=404, detail="Not Found")
+
+
+def limiter_key(request):
+    # Without trusted proxies every client shows up as the proxy's IP
+    return client_key(request) if settings.FORWARDED_ALLOW_IPS else None
+
+
+if not settings.FORWARDED_ALLOW_IPS:
+    print("⚠️ FORWARDED_ALLOW_IPS not set: per-client rate limiting is off, only the in-flight cap applies")
+
+# Guards routes that call the AI service
+ai_limiter = AdmissionLimiter(
+    rate=settings.RATE_LIMIT_PER_SECOND,
+    burst=settings.RATE_LIMIT_BURST,
+    max_in_flight=settings.AI_MAX_IN_FLIGHT,
+    max_queue=settings.AI_MAX_QUEUE,
+    queue_timeout=settings.AI_QUEUE_TIMEOUT,
+    store=build_store(settings.RATE_LIMIT_REDIS_URL),
+    key_func=limiter_key,
+)
@@ -0,0 +1,130 @@
+"""
+Serialization benchmark for the large list responses.
+
+"before" is what each route did at baseline, "after" is the typed
+response model as FastAPI serializes it now (Pydantic dump_json,
+used whenever a route has a response model and no custom
+response_class). An orjson row is printed for reference when orjson
+is installed.
+
+GET /products already had response_model=list[ProductOut], so its
+before and after are the same path; it is kept as a control.
+
+Run from backend/:
+    python -m benchmarks.bench_serialization [--n 5000] [--repeat 20]
+"""
+import argparse
+import json
+import timeit
+import uuid
+from datetime import datetime, timezone
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from app.schemas.product import ProductOut
+from app.schemas.followup import FollowupQuestionOut, FollowupsOut
+
+try:
+    import orjson
+except ImportError:  # reference row only
+    orjson = None
+
+
+class FakeProduct:
+    """Stands in for the SQLAlchemy row (attribute access only)."""
+
+    def __init__(self, i: int):
+        self.id = str(uuid.uuid4())
+        self.name = f"Product {i}"
+        self.category = "packaged food"
+        self.description = "Organic oat snack bar with dried fruit " * 3
+        self.created_at = datetime.now(timezone.utc)
+
+
+def make_data(n: int):
+    products = [FakeProduct(i) for i in range(n)]
+    questions = [
+        f"Are all ingredients of batch {i} traceable to verified suppliers?"
+        for i in range(n)
+    ]
+    return products, questions
+
+
+def stdlib_dumps(content) -> bytes:
+    # What starlette's JSONResponse.render does
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def bench(label: str, fn, repeat: int):
+    best = min(timeit.repeat(fn, number=1, repeat=repeat))
+    print(f"  {label:<44} {best * 1000:8.2f} ms")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    products, questions = make_data(args.n)
+    products_adapter = TypeAdapter(list[ProductOut])
+    followups_adapter = TypeAdapter(FollowupsOut)
+
+    # ---------- Product list ----------
+    print(f"\nGET /products  ({args.n} products)")
+
+    def products_dump_json():
+        return products_adapter.dump_json(
+            products_adapter.validate_python(products, from_attributes=True)
+        )
+
+    def products_orjson():
+        content = products_adapter.dump_python(
+            products_adapter.validate_python(products, from_attributes=True), mode="json"
+        )
+        return orjson.dumps(content)
+
+    b = bench("before/after: response model dump_json", products_dump_json, args.repeat)
+    if orjson:
+        o = bench("ref: response model + orjson response", products_orjson, args.repeat)
+        print(f"  orjson vs dump_json: {b / o:.2f}x")
+
+    # ---------- Follow-up list ----------
+    print(f"\nGET /products/{{id}}/followups  ({args.n} questions)")
+
+    def followups_before():
+        # Hand-built dicts, no response_model: jsonable_encoder + stdlib json
+        result = [
+            {"id": f"q{i+1}", "text": q, "type": "text", "options": None}
+            for i, q in enumerate(questions)
+        ]
+        return stdlib_dumps(jsonable_encoder({"followups": result}))
+
+    def build_followups():
+        return FollowupsOut(followups=[
+            FollowupQuestionOut(id=f"q{i+1}", text=q)
+            for i, q in enumerate(questions)
+        ])
+
+    def followups_after():
+        # FastAPI re-validates the returned model, then dumps to bytes
+        out = followups_adapter.validate_python(build_followups())
+        return followups_adapter.dump_json(out)
+
+    def followups_orjson():
+        out = followups_adapter.validate_python(build_followups())
+        return orjson.dumps(followups_adapter.dump_python(out, mode="json"))
+
+    b = bench("before: dicts + jsonable_encoder + stdlib", followups_before, args.repeat)
+    a = bench("after:  response model dump_json", followups_after, args.repeat)
+    if orjson:
+        bench("ref:    response model + orjson response", followups_orjson, args.repeat)
+    print(f"  speedup: {b / a:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import os
+
+# Settings() needs a DATABASE_URL at import time; tests never touch Supabase
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.db import Base
+from app.api.routes_products import router as products_router
+from app.core.ratelimit import MemoryBucketStore
+from app.utils.deps import get_db, ai_limiter
+import app.models.product, app.models.product_profile, app.models.follow_up_log  # noqa: F401
+
+
+@pytest.fixture(autouse=True)
+def fresh_limiter(monkeypatch):
+    """Don't let buckets drained by one test rate-limit the next."""
+    monkeypatch.setattr(ai_limiter, "store", MemoryBucketStore())
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+@pytest.fixture
+def products_app(engine):
+    """Products router on an in-memory SQLite DB."""
+    SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+
+    def override_get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.include_router(products_router, prefix="/products")
+    app.dependency_overrides[get_db] = override_get_db
+    return app
+
+
+@pytest.fixture
+def client(products_app):
+    return TestClient(products_app)
@@ -0,0 +1,320 @@
+import asyncio
+import time
+from collections import deque
+
+import httpx
+import pytest
+import requests
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app.api import routes_products
+from app.core import ratelimit, tracing
+from app.core.ratelimit import AdmissionLimiter, MemoryBucketStore
+from app.core.tracing import TracingMiddleware, instrument_engine
+from app.utils import deps
+
+
+class FakeAIResponse:
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {"questions": [
+            {"id": "q1", "text": "Are ingredients lab tested?", "type": "text", "options": None}
+        ]}
+
+
+def limited_app(limiter, release: asyncio.Event = None):
+    app = FastAPI()
+
+    @app.post("/work", dependencies=[Depends(limiter)])
+    async def work():
+        if release is not None:
+            await release.wait()
+        return {"status": "ok"}
+
+    return app
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def post_many(app, n, headers=None, release=None):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+        tasks = [asyncio.create_task(c.post("/work", headers=headers)) for _ in range(n)]
+        if release is not None:
+            await asyncio.sleep(0.1)
+            release.set()
+        return await asyncio.gather(*tasks)
+
+
+# -------------------------
+# Token bucket
+# -------------------------
+def test_empty_bucket_returns_429_with_retry_after():
+    limiter = AdmissionLimiter(rate=0.1, burst=2, max_in_flight=4, max_queue=4, queue_timeout=1)
+    responses = run(post_many(limited_app(limiter), 3))
+
+    assert [r.status_code for r in responses].count(200) == 2
+    rejected = [r for r in responses if r.status_code == 429]
+    assert len(rejected) == 1
+    assert int(rejected[0].headers["retry-after"]) >= 1
+    assert limiter.stats()["rejected"]["rate_limited"] == 1
+
+
+def test_spoofed_headers_do_not_get_a_fresh_bucket():
+    limiter = AdmissionLimiter(rate=0.1, burst=1, max_in_flight=4, max_queue=4, queue_timeout=1)
+    app = limited_app(limiter)
+
+    async def go():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+            first = await c.post("/work")
+            spoofed = [
+                await c.post("/work", headers={"X-Forwarded-For": f"10.0.0.{i}", "X-API-Key": str(i)})
+                for i in range(5)
+            ]
+            return first, spoofed
+
+    first, spoofed = run(go())
+    assert first.status_code == 200
+    assert all(r.status_code == 429 for r in spoofed)
+
+
+def test_zero_rate_disables_bucket():
+    limiter = AdmissionLimiter(rate=0, burst=1, max_in_flight=4, max_queue=4, queue_timeout=1)
+    responses = run(post_many(limited_app(limiter), 3))
+
+    assert all(r.status_code == 200 for r in responses)
+
+
+def test_negative_rate_rejected():
+    with pytest.raises(ValueError):
+        AdmissionLimiter(rate=-1, burst=1, max_in_flight=4, max_queue=4, queue_timeout=1)
+
+
+def test_unidentified_client_skips_bucket():
+    limiter = AdmissionLimiter(
+        rate=0.1, burst=1, max_in_flight=4, max_queue=4, queue_timeout=1,
+        key_func=lambda request: None,
+    )
+    responses = run(post_many(limited_app(limiter), 3))
+
+    assert all(r.status_code == 200 for r in responses)
+
+
+def test_bucket_refills():
+    store = MemoryBucketStore()
+
+    assert run(store.take("ip:1", rate=50, burst=1)) == (True, 0.0)
+    allowed, retry_after = run(store.take("ip:1", rate=50, burst=1))
+    assert not allowed
+    assert 0 < retry_after <= 0.02
+
+    time.sleep(0.05)
+    assert run(store.take("ip:1", rate=50, burst=1))[0]
+
+
+# -------------------------
+# In-flight cap / queue
+# -------------------------
+def test_full_queue_returns_503():
+    limiter = AdmissionLimiter(rate=100, burst=100, max_in_flight=1, max_queue=1, queue_timeout=5)
+    release = asyncio.Event()
+    responses = run(post_many(limited_app(limiter, release), 4, release=release))
+
+    codes = sorted(r.status_code for r in responses)
+    assert codes == [200, 200, 503, 503]
+    assert all("retry-after" in r.headers for r in responses if r.status_code == 503)
+    stats = limiter.stats()
+    assert stats["rejected"]["queue_full"] == 2
+    assert stats["in_flight"] == 0 and stats["queue_depth"] == 0
+
+
+def test_queue_timeout_returns_503():
+    limiter = AdmissionLimiter(rate=100, burst=100, max_in_flight=1, max_queue=4, queue_timeout=0.05)
+    release = asyncio.Event()
+    responses = run(post_many(limited_app(limiter, release), 2, release=release))
+
+    assert sorted(r.status_code for r in responses) == [200, 503]
+    assert limiter.stats()["rejected"]["queue_timeout"] == 1
+
+
+def test_redis_outage_falls_back_to_memory():
+    pytest.importorskip("redis")
+    store = ratelimit.RedisBucketStore("redis://127.0.0.1:1")
+    limiter = AdmissionLimiter(rate=0.1, burst=1, max_in_flight=4, max_queue=4, queue_timeout=1, store=store)
+    app = limited_app(limiter)
+    responses = [run(post_many(app, 1))[0] for _ in range(3)]
+
+    assert [r.status_code for r in responses] == [200, 429, 429]
+    stats = limiter.stats()
+    assert stats["store_degraded"]
+    # Redis is skipped during the cooldown instead of retried per request
+    assert stats["store_errors"] == 1
+
+
+# -------------------------
+# Backend -> AI service call
+# -------------------------
+def test_profile_save_forwards_client_and_internal_token(client, monkeypatch):
+    calls = []
+
+    def fake_post(url, json=None, headers=None, timeout=None):
+        calls.append(headers)
+        return FakeAIResponse()
+
+    monkeypatch.setattr(routes_products.requests, "post", fake_post)
+    monkeypatch.setattr(routes_products.settings, "INTERNAL_TOKEN", "s3cret")
+
+    product = client.post("/products", json={"name": "Oat bar", "category": "food", "description": "d"}).json()
+    r = client.post(f"/products/{product['id']}/profile", json={"profile": {"ingredients": "oats"}})
+
+    assert r.status_code == 200
+    assert r.json()["followups"][0]["text"] == "Are ingredients lab tested?"
+    assert calls[0]["X-Client-Id"] == "ip:testclient"
+    assert calls[0]["X-Internal-Token"] == "s3cret"
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_ai_service_rejection_passed_to_client(client, monkeypatch, status):
+    upstream = requests.Response()
+    upstream.status_code = status
+    upstream.headers["Retry-After"] = "7"
+    monkeypatch.setattr(routes_products.requests, "post", lambda *a, **k: upstream)
+
+    product = client.post("/products", json={"name": "Oat bar", "category": "food", "description": "d"}).json()
+    r = client.post(f"/products/{product['id']}/profile", json={"profile": {"ingredients": "oats"}})
+
+    assert r.status_code == status
+    assert r.headers["retry-after"] == "7"
+
+
+# -------------------------
+# Tracing
+# -------------------------
+def traced_client(app, buffer, **kwargs):
+    app.add_middleware(TracingMiddleware, buffer=buffer, **kwargs)
+    return TestClient(app)
+
+
+def ping_app():
+    app = FastAPI()
+
+    @app.get("/ping")
+    def ping():
+        return {"status": "ok"}
+
+    return app
+
+
+def test_trace_header_needs_trust():
+    untrusted, trusted = deque(), deque()
+    traced_client(ping_app(), untrusted, slow_ms=0).get("/ping", headers={"X-Trace": "1"})
+    traced_client(ping_app(), trusted, slow_ms=0, trust_header=lambda request: True).get(
+        "/ping", headers={"X-Trace": "1"}
+    )
+
+    assert len(untrusted) == 0
+    assert len(trusted) == 1
+
+
+def test_debug_token_gates_trace_header_and_debug_endpoint(monkeypatch):
+    monkeypatch.setattr(deps.settings, "DEBUG_TOKEN", "dbg")
+    buffer = deque()
+    app = ping_app()
+
+    @app.get("/debug/traces", dependencies=[Depends(deps.require_debug_token)])
+    def debug_traces():
+        return {"traces": list(buffer)}
+
+    client = traced_client(app, buffer, slow_ms=0, trust_header=deps.has_debug_token)
+
+    client.get("/ping", headers={"X-Trace": "1"})
+    client.get("/ping", headers={"X-Trace": "1", "X-Debug-Token": "wrong"})
+    assert len(buffer) == 0
+    assert client.get("/debug/traces").status_code == 404
+
+    client.get("/ping", headers={"X-Trace": "1", "X-Debug-Token": "dbg"})
+    r = client.get("/debug/traces", headers={"X-Debug-Token": "dbg"})
+    assert r.status_code == 200
+    assert [t["path"] for t in r.json()["traces"]] == ["/ping"]
+
+
+def test_debug_endpoint_disabled_without_token(monkeypatch):
+    monkeypatch.setattr(deps.settings, "DEBUG_TOKEN", None)
+    app = ping_app()
+
+    @app.get("/limits", dependencies=[Depends(deps.require_debug_token)])
+    def limits():
+        return {}
+
+    client = TestClient(app)
+    assert client.get("/limits").status_code == 404
+    assert client.get("/limits", headers={"X-Debug-Token": ""}).status_code == 404
+
+
+def test_sampled_requests_buffered_only_when_slow():
+    fast, slow = deque(), deque()
+    traced_client(ping_app(), fast, sample_rate=1.0, slow_ms=10_000).get("/ping")
+    traced_client(ping_app(), slow, sample_rate=1.0, slow_ms=0).get("/ping")
+
+    assert len(fast) == 0
+    assert slow[0]["path"] == "/ping"
+    assert slow[0]["status"] == 200
+
+
+def test_correlation_id_echoed_or_generated():
+    client = traced_client(ping_app(), deque())
+
+    assert client.get("/ping", headers={"X-Correlation-Id": "abc123"}).headers["x-correlation-id"] == "abc123"
+    assert client.get("/ping").headers["x-correlation-id"]
+
+
+def test_profile_save_propagates_trace_to_ai_service(products_app, engine, monkeypatch):
+    calls = []
+
+    def fake_post(url, json=None, headers=None, timeout=None):
+        calls.append(headers)
+        return FakeAIResponse()
+
+    monkeypatch.setattr(routes_products.requests, "post", fake_post)
+    instrument_engine(engine)
+    buffer = deque()
+    client = traced_client(products_app, buffer, slow_ms=0, trust_header=lambda request: True)
+
+    product = client.post("/products", json={"name": "Oat bar", "category": "food", "description": "d"}).json()
+    r = client.post(
+        f"/products/{product['id']}/profile",
+        json={"profile": {"ingredients": "oats"}},
+        headers={"X-Trace": "1", "X-Correlation-Id": "abc123"},
+    )
+
+    assert r.headers["x-correlation-id"] == "abc123"
+    assert calls[0]["X-Correlation-Id"] == "abc123"
+    assert calls[0]["X-Trace"] == "1"
+    spans = buffer[-1]["spans"]
+    assert spans["db"]["count"] > 0
+    assert spans["http ai_service"]["count"] == 1
+
+
+def test_failed_statement_does_not_skew_next_db_span(engine):
+    instrument_engine(engine)
+    trace = tracing.Trace()
+    token = tracing._trace.set(trace)
+    try:
+        with engine.connect() as conn:
+            with pytest.raises(Exception):
+                conn.execute(text("SELECT * FROM missing_table"))
+        time.sleep(0.2)
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    finally:
+        tracing._trace.reset(token)
+
+    assert trace.spans["db"][1] == 1
+    assert trace.spans["db"][0] < 0.1
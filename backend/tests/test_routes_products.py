@@ -0,0 +1,105 @@
+import requests
+
+from app.api import routes_products
+
+
+class FakeAIResponse:
+    status_code = 200
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {"questions": [
+            {"id": "q1", "text": "Are ingredients lab tested?", "type": "text", "options": None},
+            {"id": "q2", "text": "Is supplier traceability available?", "type": "text", "options": None},
+        ]}
+
+
+def create_product(client):
+    r = client.post("/products", json={"name": "Oat bar", "category": "food", "description": "Snack"})
+    assert r.status_code == 200
+    return r.json()
+
+
+def save_profile(client, product_id, monkeypatch):
+    monkeypatch.setattr(routes_products.requests, "post", lambda *a, **k: FakeAIResponse())
+    return client.post(f"/products/{product_id}/profile", json={"profile": {"ingredients": "oats"}})
+
+
+def test_list_products(client):
+    product = create_product(client)
+
+    r = client.get("/products")
+    assert r.status_code == 200
+    assert r.json() == [product]
+    assert set(product) == {"id", "name", "category", "description"}
+
+
+def test_get_product_without_profile(client):
+    product = create_product(client)
+
+    body = client.get(f"/products/{product['id']}").json()
+    assert body["id"] == product["id"]
+    assert body["name"] == "Oat bar"
+    assert body["created_at"]
+    # Frontend reads product.profile.profile, so "no profile" must stay {}
+    assert body["profile"] == {}
+
+
+def test_get_product_with_profile(client, monkeypatch):
+    product = create_product(client)
+    saved = save_profile(client, product["id"], monkeypatch).json()
+
+    profile = client.get(f"/products/{product['id']}").json()["profile"]
+    assert set(profile) == {"id", "product_id", "profile", "version", "created_at"}
+    assert profile["id"] == saved["profile_id"]
+    assert profile["product_id"] == product["id"]
+    assert profile["profile"] == {"ingredients": "oats"}
+
+
+def test_get_unknown_product_is_404(client):
+    r = client.get("/products/does-not-exist")
+    assert r.status_code == 404
+    assert r.json() == {"detail": "Product not found"}
+
+
+def test_save_profile_and_get_followups(client, monkeypatch):
+    product = create_product(client)
+
+    body = save_profile(client, product["id"], monkeypatch).json()
+    assert body["status"] == "ok"
+    assert [q["text"] for q in body["followups"]] == [
+        "Are ingredients lab tested?",
+        "Is supplier traceability available?",
+    ]
+
+    followups = client.get(f"/products/{product['id']}/followups").json()
+    assert followups == {"followups": [
+        {"id": "q1", "text": "Are ingredients lab tested?", "type": "text", "options": None},
+        {"id": "q2", "text": "Is supplier traceability available?", "type": "text", "options": None},
+    ]}
+
+
+def test_save_profile_survives_ai_service_error(client, monkeypatch):
+    product = create_product(client)
+
+    def fail(*args, **kwargs):
+        raise requests.ConnectionError("down")
+
+    monkeypatch.setattr(routes_products.requests, "post", fail)
+    r = client.post(f"/products/{product['id']}/profile", json={"profile": {"ingredients": "oats"}})
+
+    assert r.status_code == 200
+    assert r.json()["followups"] == []
+
+
+def test_answers_round_trip(client):
+    product = create_product(client)
+    assert client.get(f"/products/{product['id']}/answers").json() == {"answers": {}}
+
+    answers = {"q1": "Yes, COA available", "q2": "Partly"}
+    r = client.post(f"/products/{product['id']}/answers", json={"answers": answers})
+    assert r.json() == {"status": "ok", "product_id": product["id"], "saved_answers": answers}
+
+    assert client.get(f"/products/{product['id']}/answers").json() == {"answers": answers}